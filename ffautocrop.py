@@ -8,21 +8,41 @@ from pathlib import Path
 import subprocess
 import re
 import itertools
+import functools
+import json
 from typing import Tuple
 from typing import List
 from typing import Optional
 from typing import Any
+from typing import Callable
+from typing import Dict
 import utils
 import collections
 import multiprocessing
-import multiprocessing.pool
 
+# The log prefix says which cropdetect instance (and so which input) the crop point came from.
+_CROP_RE = re.compile(rb"(?:\[Parsed_cropdetect_(\d+)\b.*?)?crop=(\d+):(\d+):(\d+):(\d+)")
 
-def get_cropdetect_chunk_starts(video_path: str | Path, num_chunks: int) -> List[float]:
+# Only keyframes get to cropdetect, so there aren't many frames to go around. Don't let it skip the first two like it
+# does by default, and look at every frame on its own instead of growing the crop area over the whole stream.
+CROPDETECT_FILTER = "cropdetect=round=2:reset=1:skip=0"
+# How sparsely the strided cropdetect samples keyframes by default.
+CROPDETECT_SAMPLE_EVERY_N_KEYFRAMES = 10
+# The number of crop points the strided cropdetect needs before it's trusted.
+CROPDETECT_MIN_VOTES = 10
+# The number of chunks to cropdetect before deciding whether the rest are worth looking at.
+CROPDETECT_FIRST_PASS_CHUNKS = 3
+# The fraction of all crop points that a single crop point needs to be considered the winner.
+CROPDETECT_DOMINANT_RATIO = 0.8
+
+
+def get_cropdetect_chunk_starts(video_path: str | Path, num_chunks: int,
+                                video_duration: Optional[float] = None) -> List[float]:
     if num_chunks <= 0:
         raise ValueError(f"Number of chunks must be at least 1 (was {num_chunks})")
 
-    video_duration = utils.get_media_duration(video_path)
+    if video_duration is None:
+        video_duration = utils.get_media_duration(video_path)
 
     chunk_size = round(video_duration / num_chunks, 3)
     if chunk_size < 1:
@@ -36,28 +56,131 @@ def get_cropdetect_chunk_starts(video_path: str | Path, num_chunks: int) -> List
     return chunk_starts
 
 
-def cropdetect_chunk(video_path: str | Path, start: float, chunk_length: float,
-                     video_codec: str) -> collections.Counter:
-    # It would be nice to use the copy codec instead of a "regular" codec, but "filtering and streamcopy cannot
-    # be used together". Don't know why, that's just the way it is.
-    ff_args = ["ffmpeg", *utils.get_ffmpeg_common_options(log_level="info", show_stats=True),
-               "-ss", round(start, 3), "-i", video_path, "-t",
-               round(chunk_length, 3), "-c:v", video_codec, "-vf", "cropdetect", "-f", "null", "-"]
-    crops = subprocess.check_output([str(a) for a in ff_args], stderr=subprocess.STDOUT).decode().splitlines()
-    crops = utils.flatten(re.findall(r"(?<=crop=)\d+:\d+:\d+:\d+", c) for c in crops)
-    crops = map(lambda point: tuple(int(s.strip()) for s in point.split(":")), crops)
+def _run_cropdetect(ff_args: List[str]) -> Dict[Optional[int], collections.Counter]:
+    # Crop points are counted separately for each cropdetect filter in the graph. Lines without the usual log
+    # prefix all end up under None.
+    crop_points = collections.defaultdict(collections.Counter)
+    # Stream the log instead of buffering it. ffmpeg can write a lot to stderr, and we only care about the crop
+    # lines.
+    ff = subprocess.Popen(ff_args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=1 << 20)
+    try:
+        for line in utils.iter_ffmpeg_log_lines(ff.stderr):
+            for m in _CROP_RE.finditer(line):
+                source = None if m[1] is None else int(m[1])
+                crop_points[source][(int(m[2]), int(m[3]), int(m[4]), int(m[5]))] += 1
+    finally:
+        ff.stderr.close()
+        utils.wait_all(ff)
+    if ff.returncode != 0:
+        raise subprocess.CalledProcessError(ff.returncode, ff.args)
+    return crop_points
+
+
+def _cropdetect_strided_pass(video_path: str | Path, sample_every_n_frames: int, keyframes_only: bool,
+                             frames_on_gpu: bool) -> collections.Counter:
+    # Select before downloading from the GPU so that frames we don't analyze never leave it. If non-keyframes
+    # aren't decoded at all, n counts keyframes.
+    select = [] if sample_every_n_frames == 1 else [f"select='not(mod(n\\,{sample_every_n_frames}))'"]
+    filters = [*select, *utils.get_ffmpeg_hwdownload_filters(frames_on_gpu), CROPDETECT_FILTER]
+    skip_frame = ["-skip_frame", "nokey"] if keyframes_only else []
+    ff_args = ["ffmpeg", *utils.get_ffmpeg_common_options(log_level="info", show_stats=True,
+                                                          frames_on_gpu=frames_on_gpu, strict_errors=False),
+               *skip_frame, "-i", str(video_path),
+               "-an", "-sn", "-dn", "-vf", ",".join(filters), "-vsync", "vfr", "-f", "null", "-"]
+    return sum(_run_cropdetect(ff_args).values(), collections.Counter())
+
+
+def cropdetect_strided(video_path: str | Path, sample_every_n_keyframes: int = CROPDETECT_SAMPLE_EVERY_N_KEYFRAMES,
+                       frames_on_gpu: bool = False) -> collections.Counter:
+    """
+    Apply crop detection to an entire video in one sequential pass.
+
+    Only keyframes are decoded, and only every nth keyframe is analyzed. The file is read from start to finish
+    without seeking, which is better than chunked crop detection on storage where seeks are expensive. If that
+    doesn't give at least CROPDETECT_MIN_VOTES crop points, every keyframe is analyzed instead, and if even that
+    isn't enough, every frame.
+    :param video_path: The path to the video
+    :param sample_every_n_keyframes: Analyze one out of every this many keyframes.
+    :param frames_on_gpu: Keep decoded frames on the GPU. See utils.can_keep_frames_on_gpu.
+    :return: A counter counting the crop point and the number of times it occurred.
+    """
+    if sample_every_n_keyframes <= 0:
+        raise ValueError(f"Keyframe sampling interval must be at least 1 (was {sample_every_n_keyframes})")
+    crop_points = _cropdetect_strided_pass(video_path, sample_every_n_keyframes, True, frames_on_gpu)
+    # Short clips and long GOPs don't have many keyframes to go around.
+    if crop_points.total() < CROPDETECT_MIN_VOTES and sample_every_n_keyframes > 1:
+        # logger().debug("only %d crop points from strided cropdetect, trying every keyframe", crop_points.total())
+        crop_points = _cropdetect_strided_pass(video_path, 1, True, frames_on_gpu)
+    if crop_points.total() < CROPDETECT_MIN_VOTES:
+        # logger().debug("only %d crop points from keyframes, trying every frame", crop_points.total())
+        crop_points = _cropdetect_strided_pass(video_path, 1, False, frames_on_gpu)
+    return crop_points
+
+
+def cropdetect_chunks(video_path: str | Path, chunk_starts: List[float], chunk_length: float,
+                      frames_on_gpu: bool = False) -> List[collections.Counter]:
+    """
+    Run crop detection on several chunks of a video with a single ffmpeg process.
 
-    # Keeping only length 4 tuples probably isn't the best way to do this, but it'll do.
-    return collections.Counter(c for c in crops if len(c) == 4)
+    Each chunk is opened as its own input with an input-side seek, so only the frames in the chunks are decoded,
+    and each input gets its own cropdetect filter. This saves spawning ffmpeg once per chunk. Only keyframes are
+    decoded, and nothing is encoded.
+    :param video_path: The path to the video
+    :param chunk_starts: The start time of each chunk, in seconds.
+    :param chunk_length: The length of each chunk, in seconds.
+    :param frames_on_gpu: Keep decoded frames on the GPU. See utils.can_keep_frames_on_gpu.
+    :return: For each chunk that produced any crop points, a counter counting the crop point and the number of times
+             it occurred.
+    """
+    # If the frames are on the GPU, they have to be downloaded for cropdetect, but that's the only step that touches
+    # them there.
+    hwdownload = utils.get_ffmpeg_hwdownload_filters(frames_on_gpu)
+    # Every input needs its own hwaccel options, so they can't come from the common options.
+    hwaccel = utils.get_ffmpeg_hwaccel_options(frames_on_gpu)
+    # Each input gets its own decoder, and each decoder would otherwise start a thread per core. Split the cores
+    # between the decoders instead of running chunks * cores threads.
+    threads_per_input = max(1, multiprocessing.cpu_count() // len(chunk_starts))
+    inputs = []
+    filters = []
+    maps = []
+    for i, start in enumerate(chunk_starts):
+        # cropdetect only needs a sampling of frames, so don't bother decoding anything but keyframes.
+        # Seeking to the nearest keyframe is fine for the same reason: it's all votes over a bunch of frames
+        # anyway. As input options, -ss and -to are both positions in the input, so ffmpeg never decodes from the
+        # start of the file to get to the chunk.
+        inputs.extend([*hwaccel, "-threads", str(threads_per_input), "-skip_frame", "nokey",
+                       "-ss", f"{start:.3f}", "-noaccurate_seek", "-to", f"{start + chunk_length:.3f}",
+                       "-i", str(video_path)])
+        filters.append(f"[{i}:v:0]{','.join([*hwdownload, CROPDETECT_FILTER])}[crop{i}]")
+        maps.extend(["-map", f"[crop{i}]"])
+    # No video codec is given, so the null muxer gets its default wrapped_avframe "encoder", which doesn't
+    # actually encode anything.
+    ff_args = ["ffmpeg", *utils.get_ffmpeg_common_options(log_level="info", show_stats=True, hwaccel=False,
+                                                          strict_errors=False),
+               *inputs, "-filter_complex", ";".join(filters), *maps,
+               "-an", "-sn", "-dn", "-vsync", "vfr", "-f", "null", "-"]
+    crop_points = _run_cropdetect(ff_args)
+    # The filters are numbered in graph order, so sorting puts the chunks back in order.
+    return [crop_points[source] for source in sorted(crop_points, key=lambda s: -1 if s is None else s)]
+
+
+def has_dominant_crop_point(crop_points: collections.Counter) -> bool:
+    total = crop_points.total()
+    if total == 0:
+        return False
+    return crop_points.most_common(1)[0][1] >= CROPDETECT_DOMINANT_RATIO * total
 
 
 def cropdetect_video(video_path: str | Path, num_cropdetect_chunks: int,
-                     cropdetect_chunk_duration: float, video_codec: str) -> collections.Counter:
+                     cropdetect_chunk_duration: float,
+                     video_duration: Optional[float] = None, frames_on_gpu: bool = False) -> collections.Counter:
     """
     Apply crop detection to an entire video.
     :param video_path: The path to the video
     :param num_cropdetect_chunks: The number of equally sized chunks to break the video into to perform crop detection on.
     :param cropdetect_chunk_duration: The length of each chunk to cropdetect.
+    :param video_duration: The duration of the video, if already known. Probed from the video if not given.
+    :param frames_on_gpu: Keep decoded frames on the GPU. See utils.can_keep_frames_on_gpu.
     :return: A counter counting the crop point and the number of times it occurred.
     """
     if num_cropdetect_chunks <= 0:
@@ -65,8 +188,8 @@ def cropdetect_video(video_path: str | Path, num_cropdetect_chunks: int,
     cropdetect_chunk_duration = round(cropdetect_chunk_duration, 3)
     if cropdetect_chunk_duration <= 0:
         raise ValueError("Chunk duration must be a positive, nonzero number")
-    # logger().debug("perform cropdetect with video codec %s on %s", video_codec, video_path)
-    total_video_duration = utils.get_media_duration(video_path)
+    # logger().debug("perform cropdetect on %s", video_path)
+    total_video_duration = utils.get_media_duration(video_path) if video_duration is None else video_duration
 
     # Optimization point: if the desired chunk duration runs into the next chunk, make the duration the total
     # length of the chunk. If we don't do this, then the chunks overlap and the same frames are analyzed more
@@ -81,25 +204,104 @@ def cropdetect_video(video_path: str | Path, num_cropdetect_chunks: int,
 
     cropdetect_chunk_duration = min(cropdetect_chunk_duration, total_chunk_duration)
     # logger().debug("cropdetect duration is %.3f sec with %d chunks", cropdetect_chunk_duration, num_cropdetect_chunks)
-    chunk_starts = get_cropdetect_chunk_starts(video_path, num_cropdetect_chunks)
-    crop_points = collections.Counter()
-    thread_pool_size = multiprocessing.cpu_count()
+    chunk_starts = get_cropdetect_chunk_starts(video_path, num_cropdetect_chunks, total_video_duration)
+
+    # Most videos are framed the same way the whole way through, so start with a few chunks spread out over the
+    # video and only look at the rest if those don't agree.
+    step = math.ceil(len(chunk_starts) / CROPDETECT_FIRST_PASS_CHUNKS)
+    first_pass_starts = chunk_starts[::step]
+    first_pass = cropdetect_chunks(video_path, first_pass_starts, cropdetect_chunk_duration, frames_on_gpu)
+    crop_points = sum(first_pass, collections.Counter())
+    # Keyframe-only chunks can have very different numbers of crop points, so one busy chunk could outvote the
+    # others on its own. Only stop if at least two chunks produced crop points and each of them picked the winner.
+    if (len(first_pass) >= 2 and has_dominant_crop_point(crop_points)
+            and all(points.most_common(1)[0][0] == crop_points.most_common(1)[0][0] for points in first_pass)):
+        # logger().debug("crop point settled after %d/%d chunks", len(first_pass_starts), num_cropdetect_chunks)
+        return crop_points
+
+    remaining_starts = [start for i, start in enumerate(chunk_starts) if i % step != 0]
+    if len(remaining_starts) > 0:
+        for points in cropdetect_chunks(video_path, remaining_starts, cropdetect_chunk_duration, frames_on_gpu):
+            crop_points.update(points)
+    return crop_points
 
-    # logger().debug("thread pool size is %s", thread_pool_size)
 
-    def aux(i, start):
-        # logger().debug("cropdetect chunk %d/%d starting at %.3f sec", i, num_cropdetect_chunks, start)
-        return cropdetect_chunk(video_path, start, cropdetect_chunk_duration, video_codec)
+def get_crop_cache_path() -> Path:
+    return utils.get_cache_dir() / "cropcache.json"
 
-    with multiprocessing.pool.ThreadPool(thread_pool_size) as p:
-        for points in p.map(lambda e: aux(*e), enumerate(chunk_starts, 1)):
-            crop_points.update(points)
+
+def load_crop_cache() -> dict:
+    # A cache we can't read is no reason to fail, just start over.
+    try:
+        with open(get_crop_cache_path(), "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_crop_cache(entries: dict) -> None:
+    cache_path = get_crop_cache_path()
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Another run might have saved something since we loaded the cache, so merge with what's there right now
+    # instead of overwriting it.
+    cache = load_crop_cache()
+    cache.update(entries)
+    # Write to a temporary file and rename it over the cache so that an interrupted write can't corrupt it.
+    with tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", dir=cache_path.parent, prefix="cropcache",
+                                     delete=False) as f:
+        json.dump(cache, f)
+    os.replace(f.name, cache_path)
+
+
+def _parse_crop_cache_entry(entry: Any) -> Optional[Tuple[Tuple[int, int, int, int], int]]:
+    # Entries are [[out_width, out_height, start_x, start_y], count]. Anything else counts as a miss.
+    def is_int(x):
+        return isinstance(x, int) and not isinstance(x, bool)
+
+    if not isinstance(entry, list) or len(entry) != 2:
+        return None
+    (crop_point, count) = entry
+    if not isinstance(crop_point, list) or len(crop_point) != 4 or not all(is_int(x) for x in crop_point):
+        return None
+    if not is_int(count):
+        return None
+    return tuple(crop_point), count
+
+
+def cached_cropdetect(video_path: str | Path, detection: str,
+                      cropdetect: Callable[[], collections.Counter]) -> collections.Counter:
+    """
+    Apply crop detection to a video, reusing the result from an earlier run on the same file if there is one.
+
+    Cached results are keyed by utils.video_signature and the detection settings, and only the winning crop point is
+    kept.
+    :param video_path: The path to the video
+    :param detection: Describes how crop detection is done, so that results from different settings aren't mixed up.
+    :param cropdetect: Performs crop detection on the video if the result isn't cached.
+    :return: A counter counting the crop point and the number of times it occurred.
+    """
+    key = f"{utils.video_signature(video_path).hex()}:{detection}"
+    entry = _parse_crop_cache_entry(load_crop_cache().get(key))
+    if entry is not None:
+        (crop_point, count) = entry
+        return collections.Counter({crop_point: count})
+
+    crop_points = cropdetect()
+    winner = crop_points.most_common(1)
+    if len(winner) > 0:
+        try:
+            save_crop_cache({key: [list(winner[0][0]), winner[0][1]]})
+        except OSError:
+            # Not being able to cache the result is no reason to fail.
+            pass
     return crop_points
 
 
-def crop_video(video_path: str | Path, output_path: str | Path, num_cropdetect_chunks: int,
-               cropdetect_chunk_duration: float, video_codec: str = 'libx265',
-               output_format: Optional[str] = None, overwrite: Optional[bool] = None) -> bool:
+def crop_video(video_path: str | Path, output_path: str | Path, num_cropdetect_chunks: Optional[int],
+               cropdetect_chunk_duration: float, video_codec: Optional[str] = None,
+               output_format: Optional[str] = None, overwrite: Optional[bool] = None,
+               use_crop_cache: bool = True) -> bool:
     """
     Crop the video.
 
@@ -107,25 +309,44 @@ def crop_video(video_path: str | Path, output_path: str | Path, num_cropdetect_c
 
     :param video_path:
     :param output_path:
-    :param num_cropdetect_chunks:
+    :param num_cropdetect_chunks: If None, crop detection samples keyframes across the whole video in one pass
+                                  instead of breaking it into chunks.
     :param cropdetect_chunk_duration:
-    :param video_codec:
+    :param video_codec: Defaults to hevc_nvenc if it works on this machine, libx265 otherwise.
+    :param use_crop_cache: Whether to reuse (and save) crop points found in earlier runs.
     :return: True if the video is cropped, false if it is not cropped. A return value of false does not necessarily
              mean that an error occurred - it only means that the video was not cropped.
     """
+    encoder_options = []
     if video_codec is None or len(video_codec) == 0:
-        video_codec = 'libx265'
+        if utils.ffmpeg_has_hevc_nvenc():
+            # NVENC is a whole lot faster than libx265. -b:v 0 drops the default bitrate target so that -cq
+            # actually gives a constant quality encode.
+            video_codec = 'hevc_nvenc'
+            encoder_options = ["-preset", "p5", "-tune", "hq", "-rc", "vbr", "-cq", "22", "-b:v", "0"]
+        else:
+            video_codec = 'libx265'
 
     # logger().info("crop video at %s with codec %s", str(video_path), video_codec)
-    crop_points: List[Tuple[Any, int]] = cropdetect_video(video_path, num_cropdetect_chunks,
-                                                          cropdetect_chunk_duration, video_codec).most_common(1)
+    (current_width, current_height, video_duration, codec_name, pix_fmt) = utils.probe_video(video_path)
+    # logger().debug("video dimensions are %dx%d", current_width, current_height)
+    frames_on_gpu = utils.can_keep_frames_on_gpu(codec_name, pix_fmt)
+    if num_cropdetect_chunks is None:
+        detection = f"strided:{CROPDETECT_SAMPLE_EVERY_N_KEYFRAMES}"
+        cropdetect = functools.partial(cropdetect_strided, video_path, CROPDETECT_SAMPLE_EVERY_N_KEYFRAMES,
+                                       frames_on_gpu=frames_on_gpu)
+    else:
+        detection = f"chunks:{num_cropdetect_chunks}:{cropdetect_chunk_duration:.3f}"
+        cropdetect = functools.partial(cropdetect_video, video_path, num_cropdetect_chunks,
+                                       cropdetect_chunk_duration, video_duration=video_duration,
+                                       frames_on_gpu=frames_on_gpu)
+    crop_points: List[Tuple[Any, int]] = (cached_cropdetect(video_path, detection, cropdetect) if use_crop_cache
+                                          else cropdetect()).most_common(1)
     if len(crop_points) == 0:
         print("No crop point found", file=sys.stderr)  # TODO: change
         return False
 
     (out_width, out_height, start_crop_x, start_crop_y) = crop_points[0][0]
-    (current_width, current_height) = utils.get_video_dimensions(video_path)
-    # logger().debug("video dimensions are %dx%d", current_width, current_height)
     # logger().debug("crop point is %d:%d:%d:%d", out_width, out_height, start_crop_x, start_crop_y)
 
     # If we're only shaving off a few pixels, it's not worth it to crop. Encoding is expensive.
@@ -140,15 +361,24 @@ def crop_video(video_path: str | Path, output_path: str | Path, num_cropdetect_c
 
     output_format = [] if output_format is None else ["-f", output_format]
 
+    # The crop itself runs on the CPU. If the frames came from the GPU and the encoder is on the GPU too, put them
+    # back so that they're not copied around twice. Frames that were never on the GPU keep their own pixel format,
+    # so 10-bit sources stay 10-bit.
+    crop_filters = [*utils.get_ffmpeg_hwdownload_filters(frames_on_gpu),
+                    f"crop={out_width}:{out_height}:{start_crop_x}:{start_crop_y}"]
+    if frames_on_gpu and video_codec.endswith("_nvenc"):
+        crop_filters.append("hwupload_cuda")
+
     # We'll copy-encode all streams, except for video
-    ff_args = [*utils.get_ffmpeg_common_options(),
+    ff_args = [*utils.get_ffmpeg_common_options(frames_on_gpu=frames_on_gpu),
                "-i", str(video_path),
                "-map", "0",
                "-c:s", "copy",
                "-c:a", "copy",
                "-c:d", "copy",
                "-c:v", video_codec,
-               "-filter:v", f"crop={out_width}:{out_height}:{start_crop_x}:{start_crop_y}",
+               *encoder_options,
+               "-filter:v", ",".join(crop_filters),
                *output_format,
                str(output_path)]
     if overwrite is not None:
@@ -170,12 +400,18 @@ def make_arg_parser() -> argparse.ArgumentParser:
                         dest="output_file_path")
     parser.add_argument("-f", "--format", default=None, metavar="FORMAT", dest="output_video_format",
                         required=False, help="Output video format")
-    parser.add_argument("-n", "--num-chunks", default=10, metavar="N", dest="num_chunks",
-                        required=False, type=int, help="Number of chunks to use for cropdetect")
+    parser.add_argument("-n", "--num-chunks", default=None, metavar="N", dest="num_chunks",
+                        required=False, type=int,
+                        help="Number of chunks to use for cropdetect (default: sample the whole video in one pass)")
     parser.add_argument("-d", "--chunk-duration", default=20, metavar="SECS", dest="chunk_duration",
-                        required=False, type=float, help="Duration of each chunk for cropdetect")
+                        required=False, type=float,
+                        help="Duration of each chunk for cropdetect (only used with --num-chunks)")
     parser.add_argument("-c", "--video-codec", default=None, metavar="CODEC", dest="video_codec",
-                        required=False, type=str, help="Video codec to use when cropping")
+                        required=False, type=str,
+                        help="Video codec to use when cropping (default: hevc_nvenc if available, libx265 otherwise)")
+    parser.add_argument("--crop-cache", required=False, default=True, action=argparse.BooleanOptionalAction,
+                        dest="use_crop_cache",
+                        help="Reuse crop points found for the same file in earlier runs (default: use the cache)")
     parser.add_argument("input_file_path", metavar="FILE", type=str, action="store", help="Input file")
     return parser
 
@@ -185,7 +421,7 @@ def main():
     if len(args.output_file_path) == 0:
         print("No output file path specified", file=sys.stderr)
         return 1
-    if args.num_chunks <= 0:
+    if args.num_chunks is not None and args.num_chunks <= 0:
         print("Number of chunks must be at least 1", file=sys.stderr)
         return 1
     if not math.isfinite(args.chunk_duration) or args.chunk_duration <= 0:
@@ -193,7 +429,7 @@ def main():
         return 1
 
     cropped = crop_video(args.input_file_path, args.output_file_path, args.num_chunks, args.chunk_duration,
-                         args.video_codec, args.output_video_format)
+                         args.video_codec, args.output_video_format, use_crop_cache=args.use_crop_cache)
 
     if cropped:
         print("Video cropped")
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import sys
-import os
 import argparse
 import tempfile
 from pathlib import Path
@@ -41,12 +40,14 @@ def main() -> int:
     list_file = None
 
     try:
-        (fd, list_file) = tempfile.mkstemp(prefix="ffcat_list")
-        os.close(fd)
-        lines = "\n".join(f"file '{escape_file_name(in_file)}'" for in_file in args.input_files)
-        with open(list_file, "wb") as f:
+        # The file has to outlive the handle since ffmpeg opens it by name, so we delete it ourselves.
+        with tempfile.NamedTemporaryFile(mode="wb", prefix="ffcat_list", delete=False) as f:
+            list_file = f.name
             f.write(b"ffconcat version 1.0\n")
-            f.write(lines.encode("utf-8"))
+            for in_file in args.input_files:
+                f.write(b"file '")
+                f.write(escape_file_name(in_file).encode("utf-8"))
+                f.write(b"'\n")
         ff_args = [utils.get_ffmpeg_path(), "-safe", "0", "-f", "concat", "-i", list_file, "-c", "copy"]
         if args.overwrite_output_file is not None:
             ff_args.insert(1, "-y" if args.overwrite_output_file else "-n")
@@ -1,4 +1,7 @@
-import itertools
+import concurrent.futures
+import functools
+import hashlib
+import json
 import math
 import shutil
 from pathlib import Path
@@ -7,64 +10,135 @@ import re
 from typing import Tuple, Optional, List
 import os
 
-
-def flatten(xs) -> list:
-    return list(itertools.chain.from_iterable(xs))
+_TIME_RE = re.compile(rb"time=(\d+):(\d+):(\d+\.\d+)")
 
 
 def wait_all(*subprocesses) -> None:
-    try:
-        for sub in subprocesses:
-            sub.wait()
-    except KeyboardInterrupt:
+    def terminate_all():
         # First, immediately terminate all subprocesses.
         for sub in subprocesses:
-            sub.terminate()
+            if sub.poll() is None:
+                sub.terminate()
         # Now wait for everything
         for sub in subprocesses:
             sub.wait()
-        # Propagate error
-        # We don't want to really explicitly handle the exception here - we just want to "forward" it
-        # to the child process.
-        raise
+
+    if len(subprocesses) == 0:
+        return
+    # Wait on everything at once so that we find out about the first failure right away instead of after
+    # everything before it in the list has finished.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(subprocesses)) as executor:
+        try:
+            for future in concurrent.futures.as_completed([executor.submit(sub.wait) for sub in subprocesses]):
+                if future.result() != 0:
+                    # No point in letting everything else run, the caller is going to see the failure anyway.
+                    terminate_all()
+                    break
+        except KeyboardInterrupt:
+            terminate_all()
+            # Propagate error
+            # We don't want to really explicitly handle the exception here - we just want to "forward" it
+            # to the child process.
+            raise
+
+
+def iter_ffmpeg_log_lines(stream, block_size: int = 1 << 20):
+    # ffmpeg ends stats lines with \r instead of \n, so iterating over the stream line by line would glue all of
+    # the stats together into one huge line. Split on both instead.
+    rest = b""
+    while True:
+        block = stream.read1(block_size)
+        if len(block) == 0:
+            break
+        block = rest + block
+        lines = block.splitlines()
+        # The last line might continue in the next block.
+        rest = b"" if block.endswith((b"\r", b"\n")) else lines.pop()
+        yield from lines
+    if len(rest) > 0:
+        yield rest
 
 
 def get_media_duration(media_path: str | Path) -> float:
-    lines = subprocess.check_output(["ffmpeg", "-hide_banner", "-xerror", "-loglevel", "quiet",
-                                     "-stats_period", "0.01",
-                                     "-i", str(media_path), "-c", "copy", "-f", "null", "-"],
-                                    stderr=subprocess.STDOUT).decode().splitlines()
-    # TODO: Should a more robust time regex be used here?
-    timestamps = sorted(flatten([re.findall(r"(?<=time=)\S+", s) for s in lines]))
-    if len(timestamps) == 0:
-        raise ValueError("no video duration found")
-    raw = timestamps[-1]
-    if re.fullmatch(r"^\d+:\d+:\d+.\d+$", raw) is None:
-        raise ValueError(f"video duration does not match regex: {raw!r}")
-    hours, minutes, seconds = tuple(map(float, raw.split(":")))
-    return (hours * 60 * 60) + (minutes * 60) + seconds
+    # Normalize the path so that the same file always hits the same cache entry.
+    return _get_media_duration(str(Path(media_path).resolve()))
 
 
-def get_video_dimensions(video_path: str | Path) -> Tuple[int, int]:
-    dims = subprocess.check_output(["ffprobe", "-hide_banner", "-v", "error", "-select_streams", "v",
-                                    "-show_entries", "stream=width,height", "-of", "csv=p=0:s=x",
-                                    str(video_path)], stderr=subprocess.STDOUT).decode().strip().split('x')
-    # TODO: handle nonzero exit code
-    if len(dims) != 2:
-        raise ValueError(f"Dimensions did not split into two on x: dimensions were {dims}")
-    # width, height
-    return int(dims[0]), int(dims[1])
+@functools.lru_cache(maxsize=128)
+def _get_media_duration(media_path: str) -> float:
+    # ffprobe only has to read the container header, so this is fast no matter how long the file is.
+    try:
+        out = subprocess.check_output(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                                       "-of", "default=nk=1:nw=1", media_path], stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        return _get_media_duration_by_copy(media_path)
+    out = out.strip()
+    # Some containers don't store a duration, in which case ffprobe prints N/A.
+    if out == b"N/A":
+        return _get_media_duration_by_copy(media_path)
+    return float(out)
+
+
+def _get_media_duration_by_copy(media_path: str) -> float:
+    ff = subprocess.Popen(["ffmpeg", "-hide_banner", "-xerror", "-loglevel", "quiet",
+                           "-stats_period", "0.01",
+                           "-i", str(media_path), "-c", "copy", "-f", "null", "-"],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=1 << 20)
+    # The stats lines are always h:m:s.f, and the regex already checks the shape of each timestamp.
+    duration = None
+    try:
+        for line in iter_ffmpeg_log_lines(ff.stderr):
+            for m in _TIME_RE.finditer(line):
+                timestamp = (float(m[1]) * 60 * 60) + (float(m[2]) * 60) + float(m[3])
+                duration = timestamp if duration is None else max(duration, timestamp)
+    finally:
+        ff.stderr.close()
+        wait_all(ff)
+    if ff.returncode != 0:
+        raise subprocess.CalledProcessError(ff.returncode, ff.args)
+    if duration is None:
+        raise ValueError("no video duration found")
+    return duration
+
+
+def probe_video(video_path: str | Path) -> Tuple[int, int, float, Optional[str], Optional[str]]:
+    """
+    Get the dimensions, duration, and format of a video with a single ffprobe call.
+    :param video_path: The path to the video
+    :return: The width, height, duration (in seconds), codec name, and pixel format of the first video stream.
+    """
+    out = subprocess.check_output(["ffprobe", "-v", "error", "-select_streams", "v:0",
+                                   "-show_entries", "stream=width,height,codec_name,pix_fmt:format=duration",
+                                   "-of", "json",
+                                   str(video_path)], stderr=subprocess.DEVNULL)
+    info = json.loads(out)
+    streams = info.get("streams", [])
+    if len(streams) == 0:
+        raise ValueError(f"no video stream found in {video_path}")
+    width, height = int(streams[0]["width"]), int(streams[0]["height"])
+    # Some containers don't store a duration. get_media_duration knows how to deal with that.
+    duration = info.get("format", {}).get("duration")
+    duration = get_media_duration(video_path) if duration is None else float(duration)
+    return width, height, duration, streams[0].get("codec_name"), streams[0].get("pix_fmt")
 
 
 def fs_delete(*paths) -> None:
     for path in paths:
         if path is None:
             continue
-        path = Path(str(path))
-        if path.is_dir():
-            shutil.rmtree(str(path), ignore_errors=True)
-        else:
-            path.unlink()
+        # Almost everything we delete is a regular file, so just try to unlink it and only deal with
+        # directories if that fails.
+        try:
+            os.unlink(path)
+        except IsADirectoryError:
+            shutil.rmtree(path, ignore_errors=True)
+        except PermissionError:
+            # macOS gives EPERM instead of EISDIR for directories.
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
 
 
 def ffmpeg_get_hwaccel_decode_methods() -> List[str]:
@@ -73,23 +147,78 @@ def ffmpeg_get_hwaccel_decode_methods() -> List[str]:
     return [s.strip() for s in hwaccels if len(s.strip()) > 0]
 
 
+@functools.lru_cache(maxsize=1)
 def ffmpeg_has_cuda_decode():
     return 'cuda' in ffmpeg_get_hwaccel_decode_methods()
 
 
-def get_ffmpeg_common_options(stats_period: float = 0.25, log_level: str = None, show_stats: bool = True) -> List[str]:
+@functools.lru_cache(maxsize=1)
+def ffmpeg_has_hevc_nvenc() -> bool:
+    # The encoder being compiled in doesn't mean there's a GPU that can run it, so actually try to encode something.
+    result = subprocess.run([get_ffmpeg_path(), "-hide_banner", "-loglevel", "quiet",
+                             "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                             "-c:v", "hevc_nvenc", "-f", "null", "-"],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+# Decoded frames only stay on the GPU for 8-bit 4:2:0 streams in codecs that NVDEC handles. Anything else either
+# can't be downloaded as nv12, or NVDEC might quietly fall back to software decoding, and then there are no hardware
+# frames to download at all.
+_GPU_FRAME_CODECS = {"h264", "hevc"}
+_GPU_FRAME_PIX_FMTS = {"yuv420p", "yuvj420p"}
+
+
+def can_keep_frames_on_gpu(codec_name: Optional[str], pix_fmt: Optional[str]) -> bool:
+    return ffmpeg_has_cuda_decode() and codec_name in _GPU_FRAME_CODECS and pix_fmt in _GPU_FRAME_PIX_FMTS
+
+
+def get_ffmpeg_hwaccel_options(frames_on_gpu: bool = False) -> List[str]:
+    # These are input options, so they only apply to the next -i.
+    if not ffmpeg_has_cuda_decode():
+        return []
+    # If the frames are kept on the GPU, anything that needs them in system memory has to start its filter chain
+    # with get_ffmpeg_hwdownload_filters(). Otherwise ffmpeg copies them back itself.
+    return ["-hwaccel", "cuda", *(["-hwaccel_output_format", "cuda"] if frames_on_gpu else [])]
+
+
+def get_ffmpeg_hwdownload_filters(frames_on_gpu: bool = False) -> List[str]:
+    return ["hwdownload", "format=nv12"] if frames_on_gpu and ffmpeg_has_cuda_decode() else []
+
+
+def get_ffmpeg_common_options(stats_period: float = 0.25, log_level: str = None, show_stats: bool = True,
+                              hwaccel: bool = True, frames_on_gpu: bool = False,
+                              strict_errors: bool = True) -> List[str]:
     stats_period = round(stats_period, 3)
     if not math.isfinite(stats_period) or stats_period < 0.001:
         raise ValueError(f"invalid stats period {stats_period}, must be at least 0.001")
     if log_level is None:
         log_level = "quiet"
-    hwaccel_decode = "-hwaccel cuda".split() if ffmpeg_has_cuda_decode() else []
+    hwaccel_decode = get_ffmpeg_hwaccel_options(frames_on_gpu) if hwaccel else []
     stats = ["-stats"] if show_stats else []
-    return [str(x) for x in ["-hide_banner", "-xerror",
-                             "-loglevel", log_level,
-                             *stats, "-stats_period", f"{stats_period:.3f}",
-                             "-err_detect", "explode",
-                             *hwaccel_decode]]
+    # Without these, ffmpeg conceals decode errors and keeps going. That's not what we want when producing output,
+    # but it's fine when all we're doing is looking at the frames.
+    errors = ["-xerror", "-err_detect", "explode"] if strict_errors else []
+    return ["-hide_banner",
+            "-loglevel", log_level,
+            *stats, "-stats_period", f"{stats_period:.3f}",
+            *errors,
+            *hwaccel_decode]
+
+
+def video_signature(video_path: str | Path) -> bytes:
+    # Cheap enough to compute on every run, but it'll still change if the file is replaced or modified.
+    st = os.stat(video_path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(video_path, "rb") as f:
+        h.update(f.read(4096))
+    return h.digest()
+
+
+def get_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "ffstuff"
 
 
 def get_ffmpeg_path() -> str: